@@ -105,7 +105,9 @@ class BackwardSolver(Interpreter):
         }
         self._var_counter: int = 0
         self.inputs: List[Variable] = []
-        self.solver = z3.Solver()
+        # `maximum_input` and `minimum_input` issue many incremental checks under assumptions, for which the
+        # SimpleSolver is much faster than the default solver with its full preprocessing tactic stack:
+        self.solver = z3.SimpleSolver()
         self.solver.push()
 
     def solve(self, min_value: Optional[int] = None, max_value: Optional[int] = None) -> Optional[int]:
@@ -1,20 +1,17 @@
 import heapq
-from typing import Iterable, Iterator, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
 
 from . import Challenge
 
 
 class SearchNode:
-    def __init__(self, cavern: "Cavern", row: int = 0, col: int = 0, parent: Optional["SearchNode"] = None):
+    def __init__(self, cavern: "Cavern", row: int = 0, col: int = 0, path_cost: int = 0):
         self.row: int = row
         self.col: int = col
         self.cavern: Cavern = cavern
-        self.parent: Optional[SearchNode] = parent
-        if parent is None:
-            assert row == 0 and col == 0
-            self.path_cost: int = 0  # The starting position has no risk
-        else:
-            self.path_cost = parent.path_cost + self.cavern[row][col]
+        self.path_cost: int = path_cost
         min_remaining_moves = (self.cavern.width - (self.col + 1)) + (self.cavern.height - (self.row + 1))
         self.heuristic: int = min_remaining_moves
         self.f_cost: int = self.path_cost + self.heuristic
@@ -23,25 +20,22 @@ class SearchNode:
     def is_goal(self) -> bool:
         return self.row + 1 == self.cavern.height and self.col + 1 == self.cavern.width
 
-    def path(self) -> List["SearchNode"]:
-        n = self
-        p: List[SearchNode] = []
-        while n is not None:
-            p.append(n)
-            n = n.parent
-        return list(reversed(p))
-
     def successors(self) -> Iterator["SearchNode"]:
         if self.is_goal:
             return
-        if self.row > 0:
-            yield SearchNode(cavern=self.cavern, row=self.row-1, col=self.col, parent=self)
-        if self.row < self.cavern.height - 1:
-            yield SearchNode(cavern=self.cavern, row=self.row+1, col=self.col, parent=self)
-        if self.col > 0:
-            yield SearchNode(cavern=self.cavern, row=self.row, col=self.col-1, parent=self)
-        if self.col < self.cavern.width - 1:
-            yield SearchNode(cavern=self.cavern, row=self.row, col=self.col+1, parent=self)
+        cavern = self.cavern
+        risks = cavern.risks_flat
+        row, col, path_cost = self.row, self.col, self.path_cost
+        width = cavern.width
+        index = row * width + col
+        if row > 0:
+            yield SearchNode(cavern=cavern, row=row-1, col=col, path_cost=path_cost + int(risks[index - width]))
+        if row < cavern.height - 1:
+            yield SearchNode(cavern=cavern, row=row+1, col=col, path_cost=path_cost + int(risks[index + width]))
+        if col > 0:
+            yield SearchNode(cavern=cavern, row=row, col=col-1, path_cost=path_cost + int(risks[index - 1]))
+        if col < width - 1:
+            yield SearchNode(cavern=cavern, row=row, col=col+1, path_cost=path_cost + int(risks[index + 1]))
 
     def __hash__(self):
         return hash((self.row, self.col, self.path_cost))
@@ -57,30 +51,18 @@ class SearchNode:
         other_f = other.f_cost
         return our_f < other_f or (our_f == other_f and self.path_cost < other.path_cost)
 
-    def __str__(self):
-        path = ",".join(f"{node.row, node.col}" for node in self.path())
-        return f"path_cost={self.path_cost}\theuristic={self.heuristic}\t{path}"
-
-    def path_str(self) -> str:
-        p = self.path()
-        max_row = max(n.row for n in p)
-        max_col = max(n.col for n in p)
-        return "\n".join((
-            "".join(
-                [f" {col} ", f"[{col}]"][any(n.row == y and n.col == x for n in p)]
-                for x, col in enumerate(row[:max_col + 2])
-            )
-            for y, row in enumerate(self.cavern.risks[:max_row + 2])
-        ))
-
 
 class Cavern:
     def __init__(self, risks: Iterable[Iterable[int]]):
-        self.risks: List[List[int]] = [list(row) for row in risks]
-        self.height: int = len(self.risks)
-        self.width: int = max(len(row) for row in self.risks)
+        if isinstance(risks, np.ndarray):
+            self.risks: np.ndarray = np.ascontiguousarray(risks, dtype=np.int8)
+        else:
+            self.risks = np.array([list(row) for row in risks], dtype=np.int8)
+        self.height, self.width = self.risks.shape
+        # a flat view of `self.risks` indexed by `row * self.width + col`:
+        self.risks_flat: np.ndarray = self.risks.ravel()
 
-    def __getitem__(self, row: int) -> List[int]:
+    def __getitem__(self, row: int) -> np.ndarray:
         return self.risks[row]
 
     def shortest_path(self, to_row: int, to_col: int) -> SearchNode:
@@ -94,12 +76,8 @@ class Cavern:
             if h < best_heuristic:
                 # print(f"{(first_heuristic - h)/first_heuristic*100.0 + 0.5:05}%")
                 best_heuristic = h
-            # print(str(node))
             if node.is_goal:
                 return node
-            # print(node.path_str())
-            # print(str(node))
-            # print()
             for s in node.successors():
                 pos = (s.row, s.col)
                 if pos not in best_f_costs or best_f_costs[pos] > s.f_cost:
@@ -108,22 +86,17 @@ class Cavern:
         raise ValueError(f"There is no path from (0, 0) to ({to_row}, {to_col})")
 
     def expand(self, original_width: int, original_height: int) -> "Cavern":
-        upper_right: List[List[int]] = [
-            [[c+1,1][c >= 9] for c in row[-original_width:]] for row in self.risks
-        ]
-        lower_left: List[List[int]] = [
-            [[c+1,1][c >= 9] for c in row] for row in self.risks[-original_height:]
-        ]
-        lower_right: List[List[int]] = [
-            [[c+1,1][c >= 9] for c in row] for row in upper_right[-original_height:]
-        ]
-        expanded: List[List[int]] = [
-            self.risks[i] + upper_right[i]
-            for i in range(self.height)
-        ] + [
-            lower_left[i] + lower_right[i]
-            for i in range(original_height)
-        ]
+        def increment(risks: np.ndarray) -> np.ndarray:
+            # risks wrap around from 9 back to 1
+            return risks % 9 + 1
+
+        upper_right = increment(self.risks[:, -original_width:])
+        lower_left = increment(self.risks[-original_height:, :])
+        lower_right = increment(upper_right[-original_height:, :])
+        expanded = np.block([
+            [self.risks, upper_right],
+            [lower_left, lower_right]
+        ])
         return Cavern(expanded)
 
     def __str__(self):
@@ -1,156 +1,94 @@
-from abc import ABC, abstractmethod
-from collections import Counter, defaultdict
 import re
-from typing import Dict, Iterator, Tuple
 
-from . import Challenge
-
-
-class Line(ABC):
-    @abstractmethod
-    def points(self) -> Iterator[Tuple[int, int]]:
-        raise NotImplementedError()
-
-    @property
-    def p1(self) -> Tuple[int, int]:
-        return next(iter(self.points()))
-
-    @property
-    def x1(self) -> int:
-        return self.p1[0]
-
-    @property
-    def y1(self) -> int:
-        return self.p1[1]
-
-    @property
-    def x2(self) -> int:
-        return self.p2[0]
-
-    @property
-    def y2(self) -> int:
-        return self.p2[1]
-
-    @property
-    @abstractmethod
-    def p2(self) -> Tuple[int, int]:
-        raise NotImplementedError()
+import numpy as np
 
-    def __str__(self):
-        return f"{self.x1},{self.y1} -> {self.x2},{self.y2}"
-
-
-class HorizontalLine(Line):
-    def __init__(self, from_x: int, to_x: int, y: int):
-        if from_x > to_x:
-            from_x, to_x = to_x, from_x
-        self.from_x: int = from_x
-        self.to_x: int = to_x
-        self.y: int = y
-
-    def points(self) -> Iterator[Tuple[int, int]]:
-        yield from ((x, self.y) for x in range(self.from_x, self.to_x + 1))
-
-    @property
-    def p2(self) -> Tuple[int, int]:
-        return self.to_x, self.y
-
-
-class VerticalLine(Line):
-    def __init__(self, x: int, from_y: int, to_y: int):
-        self.x: int = x
-        if from_y > to_y:
-            from_y, to_y = to_y, from_y
-        self.from_y: int = from_y
-        self.to_y: int = to_y
-
-    def points(self) -> Iterator[Tuple[int, int]]:
-        yield from ((self.x, y) for y in range(self.from_y, self.to_y + 1))
-
-    @property
-    def p2(self) -> Tuple[int, int]:
-        return self.x, self.to_y
-
-
-class DiagonalLine(Line):
-    def __init__(self, x1: int, y1: int, x2: int, y2: int):
-        if x1 > x2:
-            # make sure x is always non-decreasing
-            x1, x2, y1, y2 = x2, x1, y2, y1
-        self._x1: int = x1
-        self._y1: int = y1
-        self._x2: int = x2
-        self._y2: int = y2
-        if x1 == x2:
-            raise ValueError(f"Line {self!s} is vertical, not diagonal!")
-        elif y1 == y2:
-            raise ValueError(f"Line {self!s} is horizontal, not diagonal!")
-        elif self._x2 - self._x1 != abs(self._y2 - self._y1):
-            raise ValueError(f"Line {self!s} is not at 45°!")
-
-    def points(self) -> Iterator[Tuple[int, int]]:
-        if self._y1 <= self._y2:
-            y_delta = 1
-        else:
-            y_delta = -1
-        for i in range(self._x2 - self._x1 + 1):
-            yield self._x1 + i, self._y1 + i * y_delta
-
-    @property
-    def p2(self) -> Tuple[int, int]:
-        return self._x2, self._y2
+from . import Challenge
 
 
 class Diagram:
-    def __init__(self):
-        self._cells: Dict[int, Dict[int, int]] = defaultdict(Counter)
-        self.max_y: int = 0
-        self.max_x: int = 0
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        # Horizontal and vertical lines are stamped into differential arrays as a +1 at their start and a -1 just past
+        # their end; a cumulative sum along the line's axis recovers the per-cell counts
+        self._horizontal: np.ndarray = np.zeros((height, width + 1), dtype=np.int16)
+        self._vertical: np.ndarray = np.zeros((height + 1, width), dtype=np.int16)
+        # Diagonal lines use the same trick along their diagonal: cell (x, y) lies on diagonal `x - y + height - 1` if
+        # the line runs down and to the right, or on anti-diagonal `x + y` if it runs down and to the left. Each of
+        # these arrays is indexed by [y, diagonal], so a cumulative sum along axis 0 walks along every diagonal at once.
+        self._diagonals: np.ndarray = np.zeros((height + 1, width + height), dtype=np.int16)
+        self._anti_diagonals: np.ndarray = np.zeros((height + 1, width + height), dtype=np.int16)
+
+    def add_horizontal(self, y: np.ndarray, x1: np.ndarray, x2: np.ndarray):
+        np.add.at(self._horizontal, (y, np.minimum(x1, x2)), 1)
+        np.add.at(self._horizontal, (y, np.maximum(x1, x2) + 1), -1)
+
+    def add_vertical(self, x: np.ndarray, y1: np.ndarray, y2: np.ndarray):
+        np.add.at(self._vertical, (np.minimum(y1, y2), x), 1)
+        np.add.at(self._vertical, (np.maximum(y1, y2) + 1, x), -1)
+
+    def add_diagonal(self, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray):
+        dx = x2 - x1
+        dy = y2 - y1
+        if np.any(np.abs(dx) != np.abs(dy)):
+            raise ValueError("Diagonal lines must be at 45°!")
+        # orient every line so that it runs downward
+        top_x = np.where(dy >= 0, x1, x2)
+        top_y = np.minimum(y1, y2)
+        bottom_y = np.maximum(y1, y2)
+        down_right = (dx >= 0) == (dy >= 0)
+        down_left = ~down_right
+        diagonal = top_x[down_right] - top_y[down_right] + self.height - 1
+        np.add.at(self._diagonals, (top_y[down_right], diagonal), 1)
+        np.add.at(self._diagonals, (bottom_y[down_right] + 1, diagonal), -1)
+        anti_diagonal = top_x[down_left] + top_y[down_left]
+        np.add.at(self._anti_diagonals, (top_y[down_left], anti_diagonal), 1)
+        np.add.at(self._anti_diagonals, (bottom_y[down_left] + 1, anti_diagonal), -1)
 
-    def __getitem__(self, y: int) -> Dict[int, int]:
-        return self._cells[y]
+    @property
+    def grid(self) -> np.ndarray:
+        rows = np.arange(self.height)[:, np.newaxis]
+        cols = np.arange(self.width)[np.newaxis, :]
+        return self._horizontal[:, :-1].cumsum(axis=1, dtype=np.int16) + \
+               self._vertical[:-1, :].cumsum(axis=0, dtype=np.int16) + \
+               self._diagonals.cumsum(axis=0, dtype=np.int16)[rows, cols - rows + self.height - 1] + \
+               self._anti_diagonals.cumsum(axis=0, dtype=np.int16)[rows, cols + rows]
 
-    def __iter__(self) -> Tuple[Tuple[int, int], int]:
-        for y, row in self._cells.items():
-            for x, count in row.items():
-                yield (x, y), count
+    def overlapping(self, min_count: int = 2) -> int:
+        return int(np.count_nonzero(self.grid >= min_count))
 
 
 LINE_PATTERN = re.compile(r"\s*(?P<x1>\d+)\s*,\s*(?P<y1>\d+)\s*->\s*(?P<x2>\d+)\s*,\s*(?P<y2>\d+)\s*")
+LINE_DTYPE = np.dtype([("x1", np.int32), ("y1", np.int32), ("x2", np.int32), ("y2", np.int32)])
 
 
 class HydrothermalVenture(Challenge):
     day = 5
 
-    def read_lines(self) -> Iterator[Line]:
-        with open(self.input_path, "r") as f:
-            for i, line in enumerate(f):
-                m = LINE_PATTERN.match(line)
-                if m:
-                    x1, y1, x2, y2 = map(int, (m.group("x1"), m.group("y1"), m.group("x2"), m.group("y2")))
-                    if y1 == y2:
-                        yield HorizontalLine(from_x=x1, to_x=x2, y=y1)
-                    elif x1 == x2:
-                        yield VerticalLine(x=x1, from_y=y1, to_y=y2)
-                    else:
-                        yield DiagonalLine(x1=x1, y1=y1, x2=x2, y2=y2)
+    def read_lines(self) -> np.ndarray:
+        """Returns a structured array of all of the lines' endpoints, with fields `x1`, `y1`, `x2`, and `y2`"""
+        return np.fromregex(self.input_path, LINE_PATTERN, dtype=LINE_DTYPE)
+
+    def draw(self, include_diagonals: bool) -> Diagram:
+        lines = self.read_lines()
+        x1, y1, x2, y2 = lines["x1"], lines["y1"], lines["x2"], lines["y2"]
+        horizontal = y1 == y2
+        vertical = (x1 == x2) & ~horizontal
+        diagram = Diagram(
+            width=int(max(x1.max(), x2.max())) + 1,
+            height=int(max(y1.max(), y2.max())) + 1
+        )
+        diagram.add_horizontal(y1[horizontal], x1[horizontal], x2[horizontal])
+        diagram.add_vertical(x1[vertical], y1[vertical], y2[vertical])
+        if include_diagonals:
+            diagonal = ~(horizontal | vertical)
+            diagram.add_diagonal(x1[diagonal], y1[diagonal], x2[diagonal], y2[diagonal])
+        return diagram
 
     @Challenge.register_part(0)
     def overlap(self):
-        diagram = Diagram()
-        for line in self.read_lines():
-            if not (isinstance(line, HorizontalLine) or isinstance(line, VerticalLine)):
-                continue
-            for x, y in line.points():
-                diagram[y][x] += 1
-        two_overlapping = sum(1 for _, count in diagram if count >= 2)
-        self.output.write(f"{two_overlapping}\n")
+        self.output.write(f"{self.draw(include_diagonals=False).overlapping()}\n")
 
     @Challenge.register_part(1)
     def diagonal(self):
-        diagram = Diagram()
-        for line in self.read_lines():
-            for x, y in line.points():
-                diagram[y][x] += 1
-        two_overlapping = sum(1 for _, count in diagram if count >= 2)
-        self.output.write(f"{two_overlapping}\n")
+        self.output.write(f"{self.draw(include_diagonals=True).overlapping()}\n")
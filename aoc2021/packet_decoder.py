@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from io import BytesIO, SEEK_CUR, SEEK_SET, SEEK_END
-import itertools
-from typing import Dict, IO, Iterable, Iterator, List, TextIO, Type, TypeVar
+from io import BytesIO, SEEK_CUR, SEEK_SET
+from typing import Dict, IO, Iterable, Iterator, List, Optional, TextIO, Tuple, Type, TypeVar
+
+import numpy as np
 
 from . import Challenge
 
@@ -11,21 +12,32 @@ class HexStringStream(BytesIO):
         super().__init__(bytes.fromhex(hex_str))
 
 
+HEX_DIGITS: np.ndarray = np.full(256, 0xFF, dtype=np.uint8)
+HEX_DIGITS[ord("0"):ord("9") + 1] = np.arange(10)
+HEX_DIGITS[ord("a"):ord("f") + 1] = np.arange(10, 16)
+HEX_DIGITS[ord("A"):ord("F") + 1] = np.arange(10, 16)
+
+
+def decode_hex(hex_str: bytes) -> bytes:
+    """Vectorized equivalent of `bytes.fromhex` using the `HEX_DIGITS` lookup table"""
+    if len(hex_str) % 2 != 0:
+        hex_str = hex_str + b"0"
+    nibbles = HEX_DIGITS[np.frombuffer(hex_str, dtype=np.uint8)]
+    if np.any(nibbles == 0xFF):
+        raise ValueError(f"Invalid hex string: {hex_str!r}")
+    return ((nibbles[0::2] << 4) | nibbles[1::2]).tobytes()
+
+
 class FileBackedHexStringStream(IO[bytes]):
     def __init__(self, hex_file: TextIO):
         super().__init__()
-        if not hex_file.seekable():
-            raise ValueError("hex_file must be seekable")
-        elif not hex_file.readable():
+        if not hex_file.readable():
             raise ValueError("hex_file must be readable")
         self.hex_file: TextIO = hex_file
-        start_offset = hex_file.tell()
-        self.offset: int = start_offset // 2
-        try:
-            hex_file.seek(0, SEEK_END)
-            self.num_bytes = hex_file.tell() // 2
-        finally:
-            hex_file.seek(start_offset)
+        # decode the remainder of the file exactly once, rather than re-seeking and re-decoding on every read
+        self._bytes: bytes = decode_hex(hex_file.read().strip().encode("ascii"))
+        self.offset: int = 0
+        self.num_bytes: int = len(self._bytes)
 
     def seekable(self) -> bool:
         return True
@@ -58,11 +70,13 @@ class FileBackedHexStringStream(IO[bytes]):
         return False
 
     def read(self, n: int = -1) -> bytes:
-        self.hex_file.seek(self.offset * 2)
-        if n == -1:
-            return bytes.fromhex(self.hex_file.read())
+        if n < 0:
+            end = self.num_bytes
         else:
-            return bytes.fromhex(self.hex_file.read(n * 2))
+            end = min(self.offset + n, self.num_bytes)
+        data = self._bytes[self.offset:end]
+        self.offset = end
+        return data
 
     def readable(self) -> bool:
         return True
@@ -118,44 +132,59 @@ class BitStream:
             raise ValueError(f"stream must be readable")
         self.stream: IO[bytes] = stream
         old_offset = self.stream.tell()
-        self.offset = old_offset * 8
         try:
-            self.stream.seek(0, SEEK_END)
-            self.bit_length: int = self.stream.tell() * 8
+            self.stream.seek(0)
+            data = self.stream.read()
         finally:
             self.stream.seek(old_offset)
+        self._data: bytes = data
+        self.bit_length: int = len(data) * 8
+        # a window of up to 64 bits over `_data`: the low `_window_bits` bits of `_window` are the next bits to be read,
+        # and `_next_byte` is the first byte that has not yet been loaded into it
+        self._window: int = 0
+        self._window_bits: int = 0
+        self._next_byte: int = 0
+        self.seek(old_offset * 8)
 
     def __bool__(self):
-        return self.offset < self.bit_length - 1
+        return self.tell() < self.bit_length - 1
+
+    def _refill(self):
+        """Loads as many whole bytes as fit into the window, leaving at least 57 bits available"""
+        num_bytes = (64 - self._window_bits) // 8
+        next_byte = self._next_byte
+        # past the end of the stream, pad with zeros
+        chunk = self._data[next_byte:next_byte + num_bytes].ljust(num_bytes, b"\0")
+        self._window = (self._window << (8 * num_bytes)) | int.from_bytes(chunk, byteorder="big")
+        self._window_bits += 8 * num_bytes
+        self._next_byte = next_byte + num_bytes
+
+    def consume(self, num_bits: int):
+        """Advances past the next `num_bits` bits, which must already be in the window (i.e., were just peeked)"""
+        self._window_bits -= num_bits
+        self._window &= (1 << self._window_bits) - 1
 
     def read(self, num_bits: int) -> int:
         result = self.peek(num_bits)
-        self.offset = min(self.bit_length, self.offset + num_bits)
+        self.consume(num_bits)
         return result
 
     def peek(self, num_bits: int) -> int:
-        self.stream.seek(self.offset // 8)
-        bits_before = self.offset % 8
-        num_bytes = (bits_before + num_bits) // 8
-        if (bits_before + num_bits) % 8 != 0:
-            num_bytes += 1
-        bits_after = 8 * num_bytes - bits_before - num_bits
-        data = self.stream.read(num_bytes)
-        if len(data) < num_bytes:
-            data = data + b"\0" * (num_bytes - len(data))
-        value = int.from_bytes(data, byteorder="big", signed=False)
-        value >>= bits_after
-        if bits_before > 0:
-            # mask out the bits_before most significant bits
-            bit_mask = 2**num_bits - 1
-            value &= bit_mask
-        return value
+        """Returns the next `num_bits` bits without consuming them; `num_bits` can be at most 57"""
+        if num_bits > self._window_bits:
+            self._refill()
+        return self._window >> (self._window_bits - num_bits)
 
     def tell(self):
-        return self.offset
+        return min(self._next_byte * 8 - self._window_bits, self.bit_length)
 
     def seek(self, offset: int):
-        self.offset = max(0, min(offset, self.bit_length))
+        offset = max(0, min(offset, self.bit_length))
+        self._next_byte = offset // 8
+        self._window = 0
+        self._window_bits = 0
+        self._refill()
+        self.consume(offset % 8)
 
 
 PACKETS_BY_TYPE: Dict[int, Type["Packet"]] = {}
@@ -164,9 +193,14 @@ T = TypeVar("T")
 
 
 class Packet(ABC):
+    __slots__ = ("version", "_value")
+
     type_id: int
     version: int
 
+    def __init__(self):
+        self._value: Optional[int] = None
+
     def __init_subclass__(cls, **kwargs):
         if hasattr(cls, "type_id") and cls.type_id is not None:
             if cls.type_id in PACKETS_BY_TYPE:
@@ -174,23 +208,41 @@ class Packet(ABC):
                                 f"{PACKETS_BY_TYPE[cls.type_id].__name__}")
             PACKETS_BY_TYPE[cls.type_id] = cls
 
-    def __iter__(self) -> "Packet":
-        yield self
+    def all_packets(self) -> List["Packet"]:
+        """Returns this packet and all of its descendants in pre-order, without recursion"""
+        packets: List[Packet] = []
+        stack: List[Packet] = [self]
+        while stack:
+            p = stack.pop()
+            packets.append(p)
+            if isinstance(p, Operator):
+                stack.extend(reversed(p.subpackets))
+        return packets
+
+    def __iter__(self) -> Iterator["Packet"]:
+        return iter(self.all_packets())
 
     @staticmethod
     def parse(bits: BitStream) -> "Packet":
         version = bits.read(3)
         type_id = bits.read(3)
         # print(f"Packet type {type_id} version {version}")
-        if type_id not in PACKETS_BY_TYPE:
+        packet_type = PACKET_TYPES[type_id]
+        if packet_type is None:
             raise NotImplementedError(f"Add support for packets of type {type_id}")
-        else:
-            p = PACKETS_BY_TYPE[type_id].parse_type(bits)
-        setattr(p, "version", version)
+        p = packet_type.parse_type(bits)
+        p.version = version
         return p
 
-    @abstractmethod
     def value(self) -> int:
+        """Returns the value of this packet, evaluating it at most once"""
+        v = self._value
+        if v is None:
+            v = self._value = self._compute_value()
+        return v
+
+    @abstractmethod
+    def _compute_value(self) -> int:
         raise NotImplementedError()
 
     @classmethod
@@ -200,33 +252,41 @@ class Packet(ABC):
 
 
 class Literal(Packet):
+    __slots__ = ("number",)
+
     type_id = 4
 
     def __init__(self, number: int):
+        super().__init__()
         self.number: int = number
 
-    def value(self) -> int:
+    def _compute_value(self) -> int:
         return self.number
 
     @classmethod
     def parse_type(cls: T, bits: BitStream) -> T:
         number = 0
-        last = False
-        while not last:
-            group = bits.read(5)
-            last = not (group & 0b10000)
-            number = (number << 4) | (group & 0b1111)
-        # print(f"\tLiteral({number})")
-        return Literal(number)
+        while True:
+            # peek eight 5-bit groups at once rather than reading each group individually
+            chunk = bits.peek(40)
+            for i in range(8):
+                group = (chunk >> (35 - 5 * i)) & 0b11111
+                number = (number << 4) | (group & 0b1111)
+                if not (group & 0b10000):
+                    bits.consume(5 * (i + 1))
+                    # print(f"\tLiteral({number})")
+                    return Literal(number)
+            bits.consume(40)
 
 
 class Operator(Packet, ABC):
-    def __init__(self, subpackets: Iterable[Packet]):
-        self.subpackets: Tuple[Packet, ...] = tuple(subpackets)
+    __slots__ = ("subpackets",)
 
-    def __iter__(self) -> Iterator[Packet]:
-        yield self
-        yield from itertools.chain(*self.subpackets)
+    def __init__(self, subpackets: Iterable[Packet]):
+        super().__init__()
+        if not isinstance(subpackets, tuple):
+            subpackets = tuple(subpackets)
+        self.subpackets: Tuple[Packet, ...] = subpackets
 
     @classmethod
     def parse_type(cls: T, bits: BitStream) -> T:
@@ -234,7 +294,10 @@ class Operator(Packet, ABC):
         if length_type_id:
             num_subpackets = bits.read(11)
             # print(f"\tOperator with {num_subpackets} sub-packets")
-            return cls((Packet.parse(bits) for _ in range(num_subpackets)))
+            subpackets: List[Optional[Packet]] = [None] * num_subpackets
+            for i in range(num_subpackets):
+                subpackets[i] = Packet.parse(bits)
+            return cls(subpackets)
         else:
             total_length = bits.read(15)
             # print(f"\tOperator with {total_length} bits of sub-packets")
@@ -248,16 +311,23 @@ class Operator(Packet, ABC):
 
 
 class Sum(Operator):
+    __slots__ = ()
+
     type_id = 0
 
-    def value(self) -> int:
-        return sum(p.value() for p in self.subpackets)
+    def _compute_value(self) -> int:
+        total = 0
+        for p in self.subpackets:
+            total += p.value()
+        return total
 
 
 class Product(Operator):
+    __slots__ = ()
+
     type_id = 1
 
-    def value(self) -> int:
+    def _compute_value(self) -> int:
         prod = 1
         for p in self.subpackets:
             prod *= p.value()
@@ -265,40 +335,66 @@ class Product(Operator):
 
 
 class Minimum(Operator):
+    __slots__ = ()
+
     type_id = 2
 
-    def value(self) -> int:
-        return min(p.value() for p in self.subpackets)
+    def _compute_value(self) -> int:
+        subpackets = self.subpackets
+        smallest = subpackets[0].value()
+        for p in subpackets[1:]:
+            v = p.value()
+            if v < smallest:
+                smallest = v
+        return smallest
 
 
 class Maximum(Operator):
+    __slots__ = ()
+
     type_id = 3
 
-    def value(self) -> int:
-        return max(p.value() for p in self.subpackets)
+    def _compute_value(self) -> int:
+        subpackets = self.subpackets
+        largest = subpackets[0].value()
+        for p in subpackets[1:]:
+            v = p.value()
+            if v > largest:
+                largest = v
+        return largest
 
 
 class GreaterThan(Operator):
+    __slots__ = ()
+
     type_id = 5
 
-    def value(self) -> int:
+    def _compute_value(self) -> int:
         return [0, 1][self.subpackets[0].value() > self.subpackets[1].value()]
 
 
 class LessThan(Operator):
+    __slots__ = ()
+
     type_id = 6
 
-    def value(self) -> int:
+    def _compute_value(self) -> int:
         return [0, 1][self.subpackets[0].value() < self.subpackets[1].value()]
 
 
 class Equals(Operator):
+    __slots__ = ()
+
     type_id = 7
 
-    def value(self) -> int:
+    def _compute_value(self) -> int:
         return [0, 1][self.subpackets[0].value() == self.subpackets[1].value()]
 
 
+# type IDs are three bits, so a tuple indexed by type ID is cheaper than looking up `PACKETS_BY_TYPE`:
+PACKET_TYPES: Tuple[Optional[Type[Packet]], ...] = tuple(PACKETS_BY_TYPE.get(type_id) for type_id in range(8))
+
+
 class PacketDecoder(Challenge):
     day = 16
 
@@ -311,7 +407,7 @@ class PacketDecoder(Challenge):
             version_sum = 0
             while bits and bits.peek(6):
                 packet = Packet.parse(bits)
-                version_sum += sum(p.version for p in packet)
+                version_sum += sum(p.version for p in packet.all_packets())
         self.output.write(f"{version_sum}\n")
 
     @Challenge.register_part(1)
@@ -1,6 +1,7 @@
-from collections import Counter
-from collections.abc import Sequence, MutableSet
-from typing import Dict, Iterable, Iterator, List, Optional, Set
+from typing import Dict, Iterable, List, Set
+
+from numba import njit
+import numpy as np
 
 from . import Challenge
 
@@ -9,12 +10,9 @@ class Cave:
     def __init__(self, name: str):
         self.name = name
         self._neighbors: Set[Cave] = set()
-
-    def successors(self, path: "Path") -> Iterator["Cave"]:
-        yield from (n for n in self.neighbors if n.can_be_added(path))
-
-    def can_be_added(self, to_path: "Path") -> bool:
-        return True
+        # the bit representing this cave in a bitmask of visited caves; big caves can be visited any number of times,
+        # so they do not have one
+        self.bit: int = 0
 
     @property
     def neighbors(self) -> Set["Cave"]:
@@ -24,75 +22,90 @@ class Cave:
         self._neighbors.add(cave)
         cave._neighbors.add(self)
 
-    def all_paths(self, to: "Cave") -> Iterator["Path"]:
-        queue: List[Path] = [Path(self)]
-        while queue:
-            path = queue.pop()
-            if path[-1] == to:
-                yield path
-            else:
-                queue.extend(s for s in path.successors() if s[-1] != self)
-
-    def __hash__(self):
-        return hash(self.name)
-
-    def __eq__(self, other):
-        return isinstance(other, Cave) and other.name == self.name
-
     def __str__(self):
         return self.name
 
 
-class Path(MutableSet[Cave], Sequence[Cave]):
-    def __init__(self, cave: Cave, parent: Optional["Path"] = None):
-        if parent is not None:
-            self._ordered: List[Cave] = list(parent._ordered)
-            self._caves: Dict[Cave, int] = Counter(parent._caves)
-            self.add(cave)
-        else:
-            self._ordered = [cave]
-            self._caves = Counter(self._ordered)
-
-    def add(self, cave: Cave):
-        self._caves[cave] += 1
-        self._ordered.append(cave)
-
-    def discard(self, value: Cave) -> None:
-        raise NotImplementedError("Paths cannot discard caves")
-
-    def num_visits(self, cave: Cave) -> int:
-        return self._caves[cave]
-
-    def __contains__(self, x) -> bool:
-        return x in self._caves
-
-    def __getitem__(self, index) -> Cave:
-        return self._ordered[index]
-
-    def __len__(self) -> int:
-        return len(self._ordered)
-
-    def __iter__(self) -> Iterator[Cave]:
-        yield from self._ordered
-
-    def successors(self) -> Iterator["Path"]:
-        yield from (Path(s, self) for s in self._ordered[-1].successors(self))
-
-    def __str__(self):
-        return ",".join(map(str, self))
-
-
 class SmallCave(Cave):
     def __init__(self, name: str, max_visits: int):
         super().__init__(name)
         self.max_visits: int = max_visits
 
-    def can_be_added(self, to_path: Path) -> bool:
-        return to_path.num_visits(self) == 0 or not any(
-            isinstance(c, SmallCave) and to_path.num_visits(c) >= c.max_visits
-            and c.name not in ("start", "end")
-            for c in to_path
-        )
+
+class CaveGraph:
+    """A compressed sparse row (CSR) representation of a cave system, suitable for `count_paths`"""
+
+    def __init__(self, caves: Iterable[Cave]):
+        caves = list(caves)
+        index_of: Dict[Cave, int] = {cave: i for i, cave in enumerate(caves)}
+        self.index_of: Dict[Cave, int] = index_of
+        self.adj_offsets: np.ndarray = np.zeros(len(caves) + 1, dtype=np.int32)
+        adj_indices: List[int] = []
+        for i, cave in enumerate(caves):
+            adj_indices.extend(index_of[n] for n in cave.neighbors)
+            self.adj_offsets[i + 1] = len(adj_indices)
+        self.adj_indices: np.ndarray = np.array(adj_indices, dtype=np.int32)
+        self.bits: np.ndarray = np.array([cave.bit for cave in caves], dtype=np.int64)
+        self.max_visits: np.ndarray = np.array([
+            cave.max_visits if isinstance(cave, SmallCave) else 0 for cave in caves
+        ], dtype=np.int64)
+        self.has_big_neighbor: np.ndarray = np.array([
+            any(not isinstance(n, SmallCave) for n in cave.neighbors) for cave in caves
+        ], dtype=np.bool_)
+        # the bitmask of each cave's small neighbors
+        self.small_neighbors: np.ndarray = np.array([
+            sum(n.bit for n in cave.neighbors) for cave in caves
+        ], dtype=np.int64)
+        # the bitmask of the small caves that can be visited a second time
+        self.revisitable: int = sum(cave.bit for cave in caves if isinstance(cave, SmallCave) and cave.max_visits >= 2)
+
+    def count_paths(self, from_cave: Cave, to_cave: Cave) -> int:
+        return int(count_paths(
+            self.index_of[from_cave], self.index_of[to_cave], self.adj_offsets, self.adj_indices, self.bits,
+            self.max_visits, self.has_big_neighbor, self.small_neighbors, self.revisitable
+        ))
+
+
+@njit(cache=True)
+def count_paths(
+        start_id: int,
+        end_id: int,
+        adj_offsets: np.ndarray,
+        adj_indices: np.ndarray,
+        bits: np.ndarray,
+        max_visits: np.ndarray,
+        has_big_neighbor: np.ndarray,
+        small_neighbors: np.ndarray,
+        revisitable: int
+) -> int:
+    """Counts the paths from `start_id` to `end_id` with a depth-first search over the arrays of a `CaveGraph`
+
+    Each stack entry is (current cave, bitmask of visited small caves, whether a small cave was already visited twice).
+
+    """
+    num_paths = 0
+    stack = [(start_id, bits[start_id], False)]
+    while stack:
+        cave, visited, doubled = stack.pop()
+        if cave == end_id:
+            num_paths += 1
+            continue
+        for i in range(adj_offsets[cave], adj_offsets[cave + 1]):
+            n = adj_indices[i]
+            bit = bits[n]
+            if bit & visited:
+                if doubled or max_visits[n] < 2:
+                    continue
+                next_visited, next_doubled = visited, True
+            else:
+                next_visited, next_doubled = visited | bit, doubled
+            if n != end_id and not has_big_neighbor[n]:
+                # every way out of `n` leads to a small cave, so `n` is a dead end if none of them can be entered
+                exits = small_neighbors[n]
+                if not exits & ~next_visited and (next_doubled or not exits & revisitable):
+                    continue
+            stack.append((n, next_visited, next_doubled))
+    return num_paths
 
 
 class PassagePathing(Challenge):
@@ -114,19 +127,35 @@ class PassagePathing(Challenge):
     @staticmethod
     def load(lines: Iterable[str], max_small_cave_visits: int) -> Dict[str, Cave]:
         caves: Dict[str, Cave] = {}
+        num_small_caves = 0
         for line in lines:
             c1, c2 = map(str.strip, line.split("-"))
             if c1 in caves:
                 cave1 = caves[c1]
             else:
                 cave1 = PassagePathing.parse_cave(c1, max_small_cave_visits=max_small_cave_visits)
+                if isinstance(cave1, SmallCave):
+                    cave1.bit = 1 << num_small_caves
+                    num_small_caves += 1
                 caves[c1] = cave1
             if c2 in caves:
                 cave2 = caves[c2]
             else:
                 cave2 = PassagePathing.parse_cave(c2, max_small_cave_visits=max_small_cave_visits)
+                if isinstance(cave2, SmallCave):
+                    cave2.bit = 1 << num_small_caves
+                    num_small_caves += 1
                 caves[c2] = cave2
             cave1.add_neighbor(cave2)
+        # Paths can never return to the start cave and never leave the end cave, so prune those edges up front
+        # rather than rediscovering that they are dead ends at every step of the search
+        start = caves.get("start")
+        if start is not None:
+            for cave in start.neighbors:
+                cave.neighbors.discard(start)
+        end = caves.get("end")
+        if end is not None:
+            end.neighbors.clear()
         return caves
 
     def test(self):
@@ -148,19 +177,15 @@ he-WI
 zg-he
 pj-fs
 start-RW"""
-        caves = PassagePathing.load(test_data.split("\n"))
-        start = caves["start"]
-        end = caves["end"]
-        print(sum(1 for _ in start.all_paths(end)))
+        caves = PassagePathing.load(test_data.split("\n"), max_small_cave_visits=1)
+        print(CaveGraph(caves.values()).count_paths(caves["start"], caves["end"]))
 
     @Challenge.register_part(0)
     def small_caves(self):
         # self.test()
         with open(self.input_path, "r") as f:
             caves = PassagePathing.load(f, max_small_cave_visits=1)
-        start = caves["start"]
-        end = caves["end"]
-        num_paths = sum(1 for _ in start.all_paths(end))
+        num_paths = CaveGraph(caves.values()).count_paths(caves["start"], caves["end"])
         self.output.write(f"{num_paths}\n")
 
     @Challenge.register_part(1)
@@ -168,7 +193,5 @@ start-RW"""
         # self.test()
         with open(self.input_path, "r") as f:
             caves = PassagePathing.load(f, max_small_cave_visits=2)
-        start = caves["start"]
-        end = caves["end"]
-        num_paths = sum(1 for _ in start.all_paths(end))
+        num_paths = CaveGraph(caves.values()).count_paths(caves["start"], caves["end"])
         self.output.write(f"{num_paths}\n")
@@ -1,44 +1,73 @@
 from pathlib import Path
-from typing import List
+
+from numba import njit
+import numpy as np
 
 from . import Challenge
 
 
+EMPTY = 0
+EAST = 1
+SOUTH = 2
+CELL_CHARS = ".>v"
+
+
+@njit(cache=True)
+def step(grid: np.ndarray, scratch: np.ndarray) -> bool:
+    """
+    Runs one full step in a single compiled call: the east-facing herd moves from `grid` into `scratch`, and then the
+    south-facing herd moves from `scratch` back into `grid`. Returns whether any cucumber moved.
+    """
+    # Both sweeps are serial and row-major over row views, since the grid is small enough that a step is dominated by
+    # dispatch and thread start-up. The wrap-around is peeled out of the east sweep to keep its inner loop branch-light.
+    height, width = grid.shape
+    last = width - 1
+    moves = 0
+    for row in range(height):
+        g = grid[row]
+        s = scratch[row]
+        for col in range(width):
+            s[col] = g[col]
+        for col in range(last):
+            if g[col] == EAST and g[col + 1] == EMPTY:
+                s[col + 1] = EAST
+                s[col] = EMPTY
+                moves += 1
+        if g[last] == EAST and g[0] == EMPTY:
+            s[0] = EAST
+            s[last] = EMPTY
+            moves += 1
+    for row in range(height):
+        g = grid[row]
+        s = scratch[row]
+        for col in range(width):
+            g[col] = s[col]
+    for row in range(height):
+        to_row = row + 1
+        if to_row == height:
+            to_row = 0
+        s = scratch[row]
+        s_below = scratch[to_row]
+        g = grid[row]
+        g_below = grid[to_row]
+        for col in range(width):
+            if s[col] == SOUTH and s_below[col] == EMPTY:
+                g_below[col] = SOUTH
+                g[col] = EMPTY
+                moves += 1
+    return moves > 0
+
+
 class Trench:
-    def __init__(self, cucumbers: List[List[str]]):
-        self.cucumbers: List[List[str]] = cucumbers
+    def __init__(self, cucumbers: np.ndarray):
+        # a 2-D array of EMPTY, EAST, or SOUTH
+        self.cucumbers: np.ndarray = cucumbers
+        # double buffer for the cucumbers, so each half-step reads from one array and writes to the other
+        self._scratch: np.ndarray = np.empty_like(cucumbers)
         self.num_steps: int = 0
 
     def step(self) -> bool:
-        changed = False
-        for row in self.cucumbers:
-            from_col = 0
-            num_cols = len(row)
-            final_col = num_cols
-            while from_col < final_col:
-                to_col = (from_col + 1) % num_cols
-                if row[from_col] == ">" and row[to_col] == ".":
-                    row[to_col] = row[from_col]
-                    row[from_col] = "."
-                    changed = True
-                    if from_col == 0:
-                        final_col -= 1
-                    from_col += 1
-                from_col += 1
-        num_rows = len(self.cucumbers)
-        for col in range(len(self.cucumbers[0])):
-            final_row = num_rows
-            from_row = 0
-            while from_row < final_row:
-                to_row = (from_row + 1) % num_rows
-                if self.cucumbers[from_row][col] == "v" and self.cucumbers[to_row][col] == ".":
-                    self.cucumbers[to_row][col] = "v"
-                    self.cucumbers[from_row][col] = "."
-                    changed = True
-                    if from_row == 0:
-                        final_row -= 1
-                    from_row += 1
-                from_row += 1
+        changed = step(self.cucumbers, self._scratch)
         if changed:
             self.num_steps += 1
         return changed
@@ -46,10 +75,12 @@ class Trench:
     @classmethod
     def load(cls, path: Path) -> "Trench":
         with open(path, "r") as f:
-            return cls([list(line.strip()) for line in f])
+            return cls(np.array([
+                [CELL_CHARS.index(c) for c in line.strip()] for line in f if line.strip()
+            ], dtype=np.uint8))
 
     def __str__(self):
-        return "\n".join(("".join(row) for row in self.cucumbers))
+        return "\n".join(("".join(CELL_CHARS[c] for c in row) for row in self.cucumbers))
 
 
 class SeaCucumber(Challenge):
@@ -58,8 +89,6 @@ class SeaCucumber(Challenge):
     @Challenge.register_part(0)
     def steps(self):
         trench = Trench.load(self.input_path)
-        print(str(trench))
         while trench.step():
-            print(trench.num_steps)
-            print(str(trench))
+            pass
         self.output.write(f"{trench.num_steps + 1}\n")
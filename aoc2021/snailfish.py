@@ -1,103 +1,140 @@
-from abc import ABC, abstractmethod
-from enum import Enum
-import itertools
 import json
-from typing import Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
-
-from . import Challenge
-
-
-class Side(Enum):
-    ROOT = -1
-    LEFT = 0
-    RIGHT = 1
-
-
-N = TypeVar("N")
+from typing import Iterator, List, Sequence, Union
 
+from numba import njit, prange
+import numpy as np
 
-class Number:
-    def __init__(self, parent: Optional["Pair"] = None, side: Side = Side.ROOT):
-        self.parent: Optional[Pair] = parent
-        self.side: Side = side
-
-    @abstractmethod
-    def magnitude(self) -> int:
-        raise NotImplementedError()
-
-    def left_values(self) -> Iterator["RegularNumber"]:
-        if self.parent is None:
-            return
-        if self.side == Side.RIGHT:
-            yield from (n for n, _ in reversed(list(self.parent.left)) if isinstance(n, RegularNumber))
-        yield from self.parent.left_values()
-
-    def right_values(self) -> Iterator["RegularNumber"]:
-        if self.parent is None:
-            return
-        if self.side == Side.LEFT:
-            yield from (n for n, _ in self.parent.right if isinstance(n, RegularNumber))
-        yield from self.parent.right_values()
-
-    def __iter__(self) -> Tuple["Number", Sequence["Number"]]:
-        stack = [(self, ())]
-        while stack:
-            number, ancestors = stack.pop()
-            yield number, ancestors
-            if isinstance(number, Pair):
-                stack.append((number.right, ancestors + (number,)))
-                stack.append((number.left, ancestors + (number,)))
-
-    @abstractmethod
-    def clone(self: N) -> N:
-        raise NotImplementedError()
-
-
-class RegularNumber(Number):
-    def __init__(
-            self,
-            value: int,
-            parent: Optional["Pair"] = None,
-            side: Side = Side.ROOT
-    ):
-        super().__init__(parent=parent, side=side)
-        self.value: int = value
-
-    def magnitude(self) -> int:
-        return self.value
+from . import Challenge
 
-    def clone(self) -> "RegularNumber":
-        return RegularNumber(value=self.value, parent=self.parent, side=self.side)
 
-    def __str__(self):
-        return str(self.value)
-
-
-class Pair(Number):
-    def __init__(
-            self,
-            left: Number,
-            right: Number,
-            parent: Optional["Pair"] = None,
-            side: Side = Side.ROOT
-    ):
-        super().__init__(parent=parent, side=side)
-        self.left: Number = left
-        self.right: Number = right
-        left.parent = self
-        right.parent = self
-        left.side = Side.LEFT
-        right.side = Side.RIGHT
+# the maximum number of regular numbers in a snailfish number while it is being reduced: a reduced number has at most
+# 2**4 regular numbers, the sum of two reduced numbers has at most twice that, and a split adds at most one more
+MAX_LENGTH = 64
+
+
+@njit(cache=True)
+def reduce_number(depths: np.ndarray, values: np.ndarray, n: int) -> int:
+    """Reduces the first `n` regular numbers of the given buffers in place, returning the new number of them"""
+    while True:
+        exploded = False
+        for i in range(n):
+            depth = depths[i]
+            if depth > 4:
+                # explode the pair made of regular numbers i and i + 1
+                if i > 0:
+                    values[i - 1] += values[i]
+                if i + 2 < n:
+                    values[i + 2] += values[i + 1]
+                values[i] = 0
+                depths[i] = depth - 1
+                for j in range(i + 1, n - 1):
+                    depths[j] = depths[j + 1]
+                    values[j] = values[j + 1]
+                n -= 1
+                exploded = True
+                break
+        if exploded:
+            continue
+        split = False
+        for i in range(n):
+            value = values[i]
+            if value >= 10:
+                for j in range(n, i + 1, -1):
+                    depths[j] = depths[j - 1]
+                    values[j] = values[j - 1]
+                left_value = value // 2
+                depths[i] += 1
+                depths[i + 1] = depths[i]
+                values[i] = left_value
+                values[i + 1] = value - left_value
+                n += 1
+                split = True
+                break
+        if not split:
+            # we neither split nor exploded
+            return n
+
+
+@njit(cache=True)
+def add_numbers(
+        a_depths: np.ndarray, a_values: np.ndarray, a_n: int,
+        b_depths: np.ndarray, b_values: np.ndarray, b_n: int,
+        out_depths: np.ndarray, out_values: np.ndarray
+) -> int:
+    """Writes the reduced sum of two snailfish numbers into the output buffers, returning its length"""
+    for i in range(a_n):
+        out_depths[i] = a_depths[i] + 1
+        out_values[i] = a_values[i]
+    for i in range(b_n):
+        out_depths[a_n + i] = b_depths[i] + 1
+        out_values[a_n + i] = b_values[i]
+    return reduce_number(out_depths, out_values, a_n + b_n)
+
+
+@njit(cache=True)
+def number_magnitude(depths: np.ndarray, values: np.ndarray, n: int) -> int:
+    return collapse_magnitude(depths[:n].copy(), values[:n].astype(np.int64), n)
+
+
+@njit(cache=True)
+def collapse_magnitude(depths: np.ndarray, values: np.ndarray, n: int) -> int:
+    """Computes the magnitude of a snailfish number by collapsing its buffers in place"""
+    while n > 1:
+        # the leftmost regular number at the maximum depth is always the left half of a pair of regular numbers
+        max_depth = depths[:n].max()
+        i = 0
+        while depths[i] != max_depth:
+            i += 1
+        values[i] = 3 * values[i] + 2 * values[i + 1]
+        depths[i] = max_depth - 1
+        for j in range(i + 1, n - 1):
+            depths[j] = depths[j + 1]
+            values[j] = values[j + 1]
+        n -= 1
+    return values[0]
+
+
+@njit(parallel=True, cache=True)
+def largest_magnitude(depths: np.ndarray, values: np.ndarray, lengths: np.ndarray) -> int:
+    """Returns the largest magnitude of the sum of any two different numbers from the given stacked buffers"""
+    count = len(lengths)
+    magnitudes = np.zeros(count, dtype=np.int64)
+    # one row of scratch space per left-hand number, reused for every sum that starts with it, so that the loop does
+    # not allocate; the magnitude of a reduced number fits in the int32 values, so it is collapsed in place
+    scratch_depths = np.empty((count, MAX_LENGTH), dtype=np.int8)
+    scratch_values = np.empty((count, MAX_LENGTH), dtype=np.int32)
+    for i in prange(count):
+        sum_depths = scratch_depths[i]
+        sum_values = scratch_values[i]
+        largest = 0
+        for j in range(count):
+            if i == j:
+                continue
+            n = add_numbers(
+                depths[i], values[i], lengths[i], depths[j], values[j], lengths[j], sum_depths, sum_values
+            )
+            magnitude = collapse_magnitude(sum_depths, sum_values, n)
+            if magnitude > largest:
+                largest = magnitude
+        magnitudes[i] = largest
+    return magnitudes.max()
+
+
+class Pair:
+    """
+    A snailfish number, stored flat as the in-order sequence of its regular numbers along with the depth at which each
+    is nested (a regular number directly inside the outermost pair has depth 1)
+    """
+
+    def __init__(self, depths: np.ndarray, values: np.ndarray):
+        self.depths: np.ndarray = depths
+        self.values: np.ndarray = values
+
+    def __len__(self):
+        return len(self.values)
 
     def magnitude(self) -> int:
-        return 3 * self.left.magnitude() + 2 * self.right.magnitude()
-
-    def clone(self) -> "Pair":
-        l = self.left.clone()
-        l.parent = self
-        r = self.right.clone()
-        r.parent = self
-        return Pair(l, r, parent=self.parent, side=self.side)
+        return int(number_magnitude(self.depths, self.values, len(self)))
 
     def __radd__(self, other) -> "Pair":
         if isinstance(other, int):
@@ -107,65 +144,45 @@ class Pair(Number):
         else:
             raise TypeError(f"Cannot add {other!r} to {self!r}")
 
-    def __add__(self, other: "Number") -> "Pair":
-        # print(f"{self!s} + {other!s}")
-        result = Pair(self.clone(), other.clone())
-        while True:
-            exploded = False
-            for number, ancestors in result:
-                assert len(ancestors) < 5
-                if isinstance(number, Pair) and len(ancestors) == 4:
-                    # print(f"Explode {number!s}")
-                    assert isinstance(number.left, RegularNumber)
-                    assert isinstance(number.right, RegularNumber)
-                    # the left value is added to the first regular number to the left of the exploding pair (if any)
-                    for left in number.left_values():
-                        left.value += number.left.value
-                        break
-                    for right in number.right_values():
-                        right.value += number.right.value
-                        break
-                    if number.side == Side.LEFT:
-                        number.parent.left = RegularNumber(0, parent=number.parent, side=Side.LEFT)
-                    else:
-                        number.parent.right = RegularNumber(0, parent=number.parent, side=Side.RIGHT)
-                    # print(f"After explode: {ancestors[0]!s}")
-                    break
-            else:
-                for number, ancestors in result:
-                    if isinstance(number, RegularNumber) and number.value >= 10:
-                        # print(f"Split {number!s}")
-                        assert len(ancestors) > 0 and number.side != Side.ROOT
-                        left_value = number.value // 2
-                        new_pair = Pair(RegularNumber(left_value), RegularNumber(number.value - left_value),
-                                        parent=number.parent, side=number.side)
-                        if number.side == Side.LEFT:
-                            number.parent.left = new_pair
-                        else:
-                            number.parent.right = new_pair
-                        # print(f"After split: {ancestors[0]!s}")
-                        break
-                else:
-                    # we neither split nor exploded
-                    break
-        return result
+    def __add__(self, other: "Pair") -> "Pair":
+        depths = np.empty(MAX_LENGTH, dtype=np.int8)
+        values = np.empty(MAX_LENGTH, dtype=np.int32)
+        n = add_numbers(self.depths, self.values, len(self), other.depths, other.values, len(other), depths, values)
+        return Pair(depths[:n].copy(), values[:n].copy())
 
     @staticmethod
     def construct(number_list: Sequence[Union[int, Sequence]]) -> "Pair":
         assert len(number_list) == 2
-        left, right = number_list
-        if isinstance(left, int):
-            left = RegularNumber(left)
-        else:
-            left = Pair.construct(left)
-        if isinstance(right, int):
-            right = RegularNumber(right)
-        else:
-            right = Pair.construct(right)
-        return Pair(left, right)
+        depths: List[int] = []
+        values: List[int] = []
+
+        def flatten(number: Union[int, Sequence], depth: int):
+            if isinstance(number, int):
+                depths.append(depth)
+                values.append(number)
+            else:
+                left, right = number
+                flatten(left, depth + 1)
+                flatten(right, depth + 1)
+
+        flatten(number_list, 0)
+        return Pair(np.array(depths, dtype=np.int8), np.array(values, dtype=np.int32))
+
+    def to_list(self) -> List[Union[int, List]]:
+        """Reconstructs the nested list representation of this number"""
+        position = 0
+
+        def build(depth: int) -> Union[int, List]:
+            nonlocal position
+            if self.depths[position] == depth:
+                position += 1
+                return int(self.values[position - 1])
+            return [build(depth + 1), build(depth + 1)]
+
+        return build(0)
 
     def __str__(self):
-        return f"[{self.left!s}, {self.right!s}]"
+        return json.dumps(self.to_list())
 
 
 class Snailfish(Challenge):
@@ -179,16 +196,29 @@ class Snailfish(Challenge):
     @Challenge.register_part(0)
     def magnitude(self):
         numbers = list(self.load())
-        total = sum(numbers)
-        print(total)
+        # fold the numbers into a pair of buffers that are swapped after each addition, rather than building a new
+        # `Pair` for every partial sum
+        depths = np.empty(MAX_LENGTH, dtype=np.int8)
+        values = np.empty(MAX_LENGTH, dtype=np.int32)
+        sum_depths = np.empty(MAX_LENGTH, dtype=np.int8)
+        sum_values = np.empty(MAX_LENGTH, dtype=np.int32)
+        n = len(numbers[0])
+        depths[:n] = numbers[0].depths
+        values[:n] = numbers[0].values
+        for number in numbers[1:]:
+            n = add_numbers(depths, values, n, number.depths, number.values, len(number), sum_depths, sum_values)
+            depths, sum_depths = sum_depths, depths
+            values, sum_values = sum_values, values
+        total = Pair(depths[:n], values[:n])
         self.output.write(f"{total.magnitude()}")
 
     @Challenge.register_part(1)
     def largest(self):
         numbers = list(self.load())
-        biggest: Optional[int] = None
-        for n1, n2 in itertools.combinations(numbers, 2):
-            total = max((n1 + n2).magnitude(), (n2 + n1).magnitude())
-            if biggest is None or biggest < total:
-                biggest = total
-        self.output.write(f"{biggest}")
+        depths = np.zeros((len(numbers), MAX_LENGTH), dtype=np.int8)
+        values = np.zeros((len(numbers), MAX_LENGTH), dtype=np.int32)
+        lengths = np.array([len(n) for n in numbers], dtype=np.int64)
+        for i, n in enumerate(numbers):
+            depths[i, :len(n)] = n.depths
+            values[i, :len(n)] = n.values
+        self.output.write(f"{largest_magnitude(depths, values, lengths)}")
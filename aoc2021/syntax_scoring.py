@@ -1,4 +1,6 @@
-from typing import List, Iterable, Tuple, Union
+from typing import Dict, List, Iterable, Optional, Union
+
+import numpy as np
 
 from . import Challenge
 
@@ -9,76 +11,81 @@ DELIMITERS = (
     ("{", "}"),
     ("<", ">"),
 )
+CLOSINGS: str = "".join(closing for _, closing in DELIMITERS)
+
+
+def _symbol_codes() -> bytes:
+    """
+    Builds a `bytes.translate` table that maps each opening to the index of its delimiter pair, each closing to that
+    index with the high bit set, and everything else to 0xFF
+    """
+    codes = bytearray(b"\xff" * 256)
+    for i, (opening, closing) in enumerate(DELIMITERS):
+        codes[ord(opening)] = i
+        codes[ord(closing)] = 0x80 | i
+    return bytes(codes)
+
+
+SYMBOL_CODES: bytes = _symbol_codes()
+ERROR_SCORES: Dict[str, int] = {")": 3, "]": 57, "}": 1197, ">": 25137}
+# completion points indexed by byte value: each closing is worth one more than its index in `DELIMITERS`
+COMPLETION_SCORES: bytes = bytes(CLOSINGS.find(chr(b)) + 1 for b in range(256))
 
 
 class Corruption:
-    def __init__(self, offset: int, expected: str, illegal: str):
+    def __init__(self, offset: int, expected: Optional[str], illegal: str):
         self.offset: int = offset
-        self.expected: str = expected
+        self.expected: Optional[str] = expected
         self.illegal: str = illegal
 
 
 class Completion:
     def __init__(self, completion: Iterable[str]):
-        self.completion: Tuple[str, ...] = tuple(completion)
+        self.completion: str = "".join(completion)
 
 
 def first_illegal_char(line: str) -> Union[Corruption, Completion]:
-    symbol_stack: List[str] = []
-    for i, symbol in enumerate(line):
-        for opening, closing in DELIMITERS:
-            if symbol == opening:
-                # print(f"{'    ' * len(symbol_stack)}{symbol}")
-                symbol_stack.append(closing)
-                break
-            elif symbol == closing:
-                if not symbol_stack:
-                    expected = None
-                else:
-                    expected = symbol_stack.pop()
-                if expected != symbol:
-                    return Corruption(i, expected, symbol)
-                # print(f"{'    ' * len(symbol_stack)}{closing}")
-                break
-    return Completion(reversed(symbol_stack))
+    # the stack holds the codes of the expected closings
+    symbol_stack: List[int] = []
+    for i, code in enumerate(line.encode("ascii").translate(SYMBOL_CODES)):
+        if code < 0x80:
+            symbol_stack.append(code | 0x80)
+        elif code != 0xFF:
+            if not symbol_stack:
+                return Corruption(i, None, CLOSINGS[code & 0x7F])
+            expected = symbol_stack.pop()
+            if expected != code:
+                return Corruption(i, CLOSINGS[expected & 0x7F], CLOSINGS[code & 0x7F])
+    return Completion(CLOSINGS[code & 0x7F] for code in reversed(symbol_stack))
 
 
 class SyntaxScoring(Challenge):
     day = 10
 
+    def load(self) -> List[Union[Corruption, Completion]]:
+        """Checks each line of the input"""
+        with open(self.input_path, "r") as f:
+            return [first_illegal_char(line) for line in f]
+
     @Challenge.register_part(0)
     def errors(self):
         points = 0
-        with open(self.input_path, "r") as f:
-            for line in f:
-                result = first_illegal_char(line)
-                if not isinstance(result, Corruption):
-                    print(f"VALID   {line.strip()}")
-                    continue
-                print(f"INVALID {line[:result.offset]}|EXPECTED {result.expected!r} BUT FOUND "
-                      f"{result.illegal!r}|{line[result.offset+1:].strip()}")
-                if result.illegal == ")":
-                    points += 3
-                elif result.illegal == "]":
-                    points += 57
-                elif result.illegal == "}":
-                    points += 1197
-                elif result.illegal == ">":
-                    points += 25137
+        for result in self.load():
+            if not isinstance(result, Corruption):
+                continue
+            points += ERROR_SCORES[result.illegal]
         self.output.write(f"{points}\n")
 
     @Challenge.register_part(1)
     def completion(self):
         scores = []
-        with open(self.input_path, "r") as f:
-            for line in f:
-                result = first_illegal_char(line)
-                if not isinstance(result, Completion):
-                    continue
-                score = 0
-                for c in result.completion:
-                    p = (")", "]", "}", ">").index(c) + 1
-                    score = score * 5 + p
-                scores.append(score)
-        scores = sorted(scores)
-        self.output.write(f"{scores[len(scores) // 2]}\n")
+        for result in self.load():
+            if not isinstance(result, Completion):
+                continue
+            score = 0
+            for c in result.completion.encode("ascii"):
+                score = score * 5 + COMPLETION_SCORES[c]
+            scores.append(score)
+        # the puzzle guarantees an odd number of scores, so the middle one can be selected without a full sort
+        middle = int(np.partition(np.array(scores, dtype=np.int64), len(scores) // 2)[len(scores) // 2])
+        self.output.write(f"{middle}\n")
@@ -1,4 +1,6 @@
-from typing import List, Optional
+import math
+
+import numpy as np
 
 from . import Challenge
 
@@ -6,31 +8,33 @@ from . import Challenge
 class TheTreacheryOfWhales(Challenge):
     day = 7
 
+    def load(self) -> np.ndarray:
+        with open(self.input_path, "rb") as f:
+            return np.fromstring(f.read(), sep=",", dtype=np.int64)
+
     @Challenge.register_part(0)
     def fuel(self):
-        with open(self.input_path, "r") as f:
-            positions: List[int] = [int(position) for position in f.read().split(",")]
-        best_cost: Optional[int] = None
-        for possibility in range(min(positions), max(positions) + 1):
-            fuel_spent = sum(abs(p - possibility) for p in positions)
-            if best_cost is None or fuel_spent < best_cost:
-                best_cost = fuel_spent
+        positions = self.load()
+        # the total distance to a point is minimized at the median
+        median = np.partition(positions, len(positions) // 2)[len(positions) // 2]
+        best_cost = int(np.abs(positions - median).sum())
         self.output.write(str(best_cost))
         self.output.write("\n")
 
     @staticmethod
-    def increased_move_cost(distance: int) -> int:
+    def increased_move_cost(distance: np.ndarray) -> np.ndarray:
         distance = abs(distance)
         return distance * (distance + 1) // 2
 
     @Challenge.register_part(1)
     def increased_cost(self):
-        with open(self.input_path, "r") as f:
-            positions: List[int] = [int(position) for position in f.read().split(",")]
-        best_cost: Optional[int] = None
-        for possibility in range(min(positions), max(positions) + 1):
-            fuel_spent = sum(TheTreacheryOfWhales.increased_move_cost(p - possibility) for p in positions)
-            if best_cost is None or fuel_spent < best_cost:
-                best_cost = fuel_spent
+        positions = self.load()
+        # the total cost is convex and its real-valued minimum is within half a step of the mean, so only the few
+        # integers around the mean need to be checked
+        mean = positions.mean()
+        best_cost = min(
+            int(TheTreacheryOfWhales.increased_move_cost(positions - possibility).sum())
+            for possibility in range(math.floor(mean - 0.5), math.ceil(mean + 0.5) + 1)
+        )
         self.output.write(str(best_cost))
         self.output.write("\n")
@@ -1,85 +1,72 @@
-from typing import Iterable, Optional, Sequence, Set, Tuple
+from typing import Sequence, Tuple
+
+from numba import njit, prange
+import numpy as np
 
 from . import Challenge
 
 
+@njit(parallel=True, cache=True)
+def enhance_pixels(padded: np.ndarray, mapping: np.ndarray, out: np.ndarray):
+    """Writes the enhancement of every pixel of `padded` that has a full neighborhood into `out`"""
+    height, width = out.shape
+    for row in prange(height):
+        for col in range(width):
+            index = 0
+            for yoffset in range(3):
+                for xoffset in range(3):
+                    index = (index << 1) | padded[row + yoffset, col + xoffset]
+            out[row, col] = mapping[index]
+
+
 class InfiniteImage:
-    def __init__(
-            self,
-            light_pixels: Iterable[Tuple[int, int]],
-            min_x: Optional[int] = None,
-            max_x: Optional[int] = None,
-            min_y: Optional[int] = None,
-            max_y: Optional[int] = None,
-            outer_pixels_are_dark: bool = True
-    ):
-        self.light_pixels: Set[Tuple[int, int]] = set(light_pixels)
-        if max_x is None:
-            self.max_x: int = max(x for x, _ in self.light_pixels)
-        else:
-            self.max_x = max_x
-        if min_x is None:
-            self.min_x: int = min(x for x, _ in self.light_pixels)
-        else:
-            self.min_x = min_x
-        if max_y is None:
-            self.max_y: int = max(y for _, y in self.light_pixels)
-        else:
-            self.max_y = max_y
-        if min_y is None:
-            self.min_y: int = min(y for _, y in self.light_pixels)
-        else:
-            self.min_y = min_y
+    def __init__(self, pixels: np.ndarray, min_x: int = 0, min_y: int = 0, outer_pixels_are_dark: bool = True):
+        # a 2-D array indexed by [y - min_y, x - min_x] that is 1 where the pixel is light
+        self.pixels: np.ndarray = pixels
+        self.min_x: int = min_x
+        self.min_y: int = min_y
         self.outer_pixels_are_dark: bool = outer_pixels_are_dark
 
+    @property
+    def max_x(self) -> int:
+        return self.min_x + self.pixels.shape[1] - 1
+
+    @property
+    def max_y(self) -> int:
+        return self.min_y + self.pixels.shape[0] - 1
+
+    @property
+    def num_light_pixels(self) -> int:
+        return int(self.pixels.sum())
+
     def is_light(self, x: int, y: int) -> bool:
         if x < self.min_x or x > self.max_x or y < self.min_y or y > self.max_y:
             return not self.outer_pixels_are_dark
-        return (x, y) in self.light_pixels
+        return bool(self.pixels[y - self.min_y, x - self.min_x])
 
     def neighborhood(self, x: int, y: int) -> Tuple[bool, bool, bool, bool, bool, bool, bool, bool, bool]:
         return tuple(self.is_light(x + xoffset, y + yoffset) for yoffset in range(-1, 2) for xoffset in range(-1, 2))
 
     def __str__(self):
-        return "\n".join((
-            "".join((
-                [".", "#"][self.is_light(x, y)]
-                for x in range(self.min_x, self.max_x + 1)
-            ))
-            for y in range(self.min_y, self.max_y + 1)
-        ))
+        return "\n".join(("".join(".#"[p] for p in row) for row in self.pixels))
 
 
 class EnhancementAlgorithm:
     def __init__(self, mapping: Sequence[bool]):
-        self.mapping: Sequence[bool] = mapping
+        self.mapping: np.ndarray = np.asarray(mapping, dtype=np.uint8)
 
     def enhance(self, image: InfiniteImage) -> InfiniteImage:
-        light_pixels = []
-        new_min_x = image.min_x - 2
-        new_max_x = image.max_x + 2
-        new_min_y = image.min_y - 2
-        new_max_y = image.max_y + 2
-        for x in range(new_min_x, new_max_x + 1):
-            for y in range(new_min_y, new_max_y + 1):
-                value = 0
-                for n in image.neighborhood(x, y):
-                    value <<= 1
-                    if n:
-                        value |= 0b1
-                if self.mapping[value]:
-                    light_pixels.append((x, y))
-        if image.outer_pixels_are_dark:
-            new_outer_pixels_are_dark = not self.mapping[0]
-        else:
-            new_outer_pixels_are_dark = not self.mapping[0b111111111]
+        # every pixel within one of the image can be affected by it; everything farther out is an outer pixel
+        height, width = image.pixels.shape
+        outer = 0 if image.outer_pixels_are_dark else 1
+        padded = np.pad(image.pixels, 2, constant_values=outer)
+        pixels = np.empty((height + 2, width + 2), dtype=np.uint8)
+        enhance_pixels(padded, self.mapping, pixels)
         return InfiniteImage(
-            light_pixels=light_pixels,
-            min_x=new_min_x,
-            max_x=new_max_x,
-            min_y=new_min_y,
-            max_y=new_max_y,
-            outer_pixels_are_dark=new_outer_pixels_are_dark
+            pixels=pixels,
+            min_x=image.min_x - 1,
+            min_y=image.min_y - 1,
+            outer_pixels_are_dark=not self.mapping[0b111111111 * outer]
         )
 
 
@@ -87,41 +74,25 @@ class TrenchMap(Challenge):
     day = 20
 
     def load(self) -> Tuple[InfiniteImage, EnhancementAlgorithm]:
-        with open(self.input_path, "r") as f:
-            algorithm = None
-            light_pixels = []
-            row = 0
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                if algorithm is None:
-                    algorithm = EnhancementAlgorithm([c == "#" for c in line])
-                else:
-                    for col, c in enumerate(line):
-                        if c == "#":
-                            light_pixels.append((col, row))
-                    row += 1
-        return InfiniteImage(light_pixels), algorithm
+        with open(self.input_path, "rb") as f:
+            # the algorithm followed by the rows of the image, none of which contain whitespace
+            lines = f.read().split()
+        algorithm = EnhancementAlgorithm(np.frombuffer(lines[0], dtype=np.uint8) == ord("#"))
+        pixels = np.frombuffer(b"".join(lines[1:]), dtype=np.uint8) == ord("#")
+        return InfiniteImage(pixels.astype(np.uint8).reshape(len(lines) - 1, -1)), algorithm
 
     @Challenge.register_part(0)
     def pixel_count(self):
         image, algorithm = self.load()
-        print(str(image))
         image = algorithm.enhance(image)
-        print()
-        print(str(image))
         image = algorithm.enhance(image)
-        print()
-        print(str(image))
         assert image.outer_pixels_are_dark
-        self.output.write(f"{len(image.light_pixels)}\n")
+        self.output.write(f"{image.num_light_pixels}\n")
 
     @Challenge.register_part(1)
     def lots_of_pixels(self):
         image, algorithm = self.load()
-        for i in range(50):
-            print(f"Enhancement {i + 1}...")
+        for _ in range(50):
             image = algorithm.enhance(image)
         assert image.outer_pixels_are_dark
-        self.output.write(f"{len(image.light_pixels)}\n")
+        self.output.write(f"{image.num_light_pixels}\n")
@@ -1,7 +1,10 @@
 from enum import Enum
 import math
 import re
-from typing import Dict, Iterator, List, Optional, Set, Tuple
+from typing import Dict, Iterator, List, Set, Tuple
+
+from numba import njit
+import numpy as np
 
 from . import Challenge
 
@@ -12,17 +15,19 @@ class Result(Enum):
     TOO_SLOW_Y = 2
 
 
-def simulate(v_x: int, v_y: int, initial_x: int = 0, initial_y: int = 0) -> Iterator[Tuple[int, int]]:
-    x, y = initial_x, initial_y
-    while True:
-        x += v_x
-        if v_x > 0:
-            v_x -= 1
-        elif v_x < 0:
-            v_x += 1
-        y += v_y
-        v_y -= 1
-        yield x, y
+@njit(cache=True)
+def position(v_x: int, v_y: int, step: int, initial_x: int = 0, initial_y: int = 0) -> Tuple[int, int]:
+    """Returns the closed-form position of the probe after the given number of steps"""
+    drag = step * (step - 1) // 2
+    speed_x = abs(v_x)
+    if step <= speed_x:
+        distance_x = step * speed_x - drag
+    else:
+        # drag has brought the probe to a horizontal stop
+        distance_x = speed_x * (speed_x + 1) // 2
+    if v_x < 0:
+        distance_x = -distance_x
+    return initial_x + distance_x, initial_y + step * v_y - drag
 
 
 def print_trajectory(
@@ -40,7 +45,10 @@ def print_trajectory(
     max_y = max(initial_y, target_max_y)
     min_x = min(initial_x, target_min_x)
     min_y = min(initial_y, target_min_y)
-    for x, y in simulate(v_x, v_y, initial_x, initial_y):
+    step = 0
+    while True:
+        step += 1
+        x, y = position(v_x, v_y, step, initial_x, initial_y)
         if y < target_min_y or x > target_max_x:
             break
         positions.append((x, y))
@@ -50,37 +58,57 @@ def print_trajectory(
         max_y = max(y, max_y)
         if target_min_x <= x <= target_max_x and target_min_y <= y <= target_max_y:
             break
-    field = [["." for _ in range(max_x - min_x + 1)] for _ in range(max_y - min_y + 1)]
-    field[initial_y - min_y][initial_x - min_x] = "S"
-    for y in range(target_min_y, target_max_y + 1):
-        for x in range(target_min_x, target_max_x + 1):
-            field[y - min_y][x - min_x] = "T"
-    for x, y in positions:
-        field[y - min_y][x - min_x] = "#"
-    print("\n".join(("".join(row) for row in reversed(field))))
+    field = np.full((max_y - min_y + 1, max_x - min_x + 1), ".", dtype="<U1")
+    field[initial_y - min_y, initial_x - min_x] = "S"
+    field[target_min_y - min_y:target_max_y - min_y + 1, target_min_x - min_x:target_max_x - min_x + 1] = "T"
+    if positions:
+        xs, ys = np.array(positions).T
+        field[ys - min_y, xs - min_x] = "#"
+    print("\n".join(("".join(row) for row in field[::-1])))
 
 
-def calculate_result(
+@njit(cache=True)
+def _calculate_result(
         v_x: int,
         v_y: int,
         target_min_x: int,
         target_max_x: int,
         target_min_y: int,
         target_max_y: int,
-        initial_x: int = 0,
-        initial_y: int = 0
-) -> Tuple[Result, int]:
-    max_y: Optional[int] = None
-    for x, y in simulate(v_x, v_y, initial_x=initial_x, initial_y=initial_y):
-        if max_y is None or y > max_y:
+        initial_x: int,
+        initial_y: int
+) -> Tuple[int, int]:
+    """Returns the value of the `Result` of the given launch along with the maximum y it reaches"""
+    max_y = initial_y + v_y
+    step = 0
+    while True:
+        step += 1
+        x, y = position(v_x, v_y, step, initial_x, initial_y)
+        if y > max_y:
             max_y = y
         if target_min_x <= x <= target_max_x and target_min_y <= y <= target_max_y:
-            return Result.SUCCESS, max_y
+            return 0, max_y
         elif x > target_max_x or y < target_min_y:
             if y > target_max_y or x > target_max_x:
-                return Result.TOO_FAST_Y, max_y
-            elif y < target_min_y:
-                return Result.TOO_SLOW_Y, max_y
+                return 1, max_y
+            else:
+                return 2, max_y
+
+
+def calculate_result(
+        v_x: int,
+        v_y: int,
+        target_min_x: int,
+        target_max_x: int,
+        target_min_y: int,
+        target_max_y: int,
+        initial_x: int = 0,
+        initial_y: int = 0
+) -> Tuple[Result, int]:
+    result, max_y = _calculate_result(
+        v_x, v_y, target_min_x, target_max_x, target_min_y, target_max_y, initial_x, initial_y
+    )
+    return Result(result), max_y
 
 
 def solve(
@@ -142,6 +170,35 @@ def solve(
                     yield v_x, v_y, max_y
 
 
+def count_distinct(target_min_x: int, target_max_x: int, target_min_y: int, target_max_y: int) -> int:
+    """
+    Counts the initial velocities (launched from the origin) that put the probe in the target at some step.
+
+    The x and y trajectories are independent, so this computes, for each v_x and for each v_y separately, a bitmask of
+    the steps at which that axis is within the target, from the closed-form positions. A pair of velocities hits the
+    target if and only if their bitmasks intersect.
+    """
+    assert 0 < target_min_x and target_min_y < 0
+    v_x = np.arange(1, target_max_x + 1, dtype=np.int64)
+    # a probe launched upward with velocity v_y comes back down through y=0 with velocity -v_y - 1
+    v_y = np.arange(target_min_y, -target_min_y, dtype=np.int64)
+    t = np.arange(1, 2 * -target_min_y + 2, dtype=np.int64)
+    drag = t * (t - 1) // 2
+    x = np.where(t[None, :] <= v_x[:, None], t[None, :] * v_x[:, None] - drag, (v_x * (v_x + 1) // 2)[:, None])
+    y = t[None, :] * v_y[:, None] - drag
+    x_masks = pack_steps((target_min_x <= x) & (x <= target_max_x))
+    y_masks = pack_steps((target_min_y <= y) & (y <= target_max_y))
+    return int((x_masks[:, None, :] & y_masks[None, :, :]).any(axis=2).sum())
+
+
+def pack_steps(hits: np.ndarray) -> np.ndarray:
+    """Packs each row of a boolean (velocities, steps) array into a row of 64-bit words"""
+    packed = np.packbits(hits, axis=1)
+    padding = -packed.shape[1] % 8
+    packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
 TARGET_PATTERN = re.compile(r"^\s*target\s+area:\s*x\s*=\s*(\d+)\s*..\s*(\d+),\s*y\s*=\s*(-?\d+)\s*..\s*(-?\d+)\s*$")
 
 
@@ -163,11 +220,19 @@ class TrickShot(Challenge):
     @Challenge.register_part(0)
     def highest(self):
         min_x, max_x, min_y, max_y = self.load()
-        self.output.write(f"{max(m for _, _, m in solve(min_x, max_x, min_y, max_y))}\n")
-        # print_trajectory(7, 2, 20, 30, -10, -5)
+        # A probe launched upward with velocity v_y comes back down through y=0 with velocity -v_y - 1, so the highest
+        # shot that can still hit the target uses v_y = -min_y - 1, provided some v_x comes to rest over the target
+        # by the time the probe falls into it. That shot peaks at the triangular number of v_y.
+        if min_y < 0 and any(
+                min_x <= v_x * (v_x + 1) // 2 <= max_x for v_x in range(1, min(max_x, -2 * min_y) + 1)
+        ):
+            highest = min_y * (min_y + 1) // 2
+        else:
+            highest = max(m for _, _, m in solve(min_x, max_x, min_y, max_y))
+        self.output.write(f"{highest}\n")
 
     @Challenge.register_part(1)
     def distinct(self):
         min_x, max_x, min_y, max_y = self.load()
-        valid = sum(1 for _ in solve(min_x, max_x, min_y, max_y))
+        valid = count_distinct(min_x, max_x, min_y, max_y)
         self.output.write(f"{valid}\n")
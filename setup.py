@@ -8,7 +8,10 @@ setup(
     version="1.0",
     packages=find_packages(exclude=['test']),
     python_requires='>=3.9',
-    install_requires=["tqdm", "z3-solver"],
+    install_requires=["numba", "numpy", "z3-solver"],
+    extras_require={
+        "dev": ["pytest", "pytest-xdist"]
+    },
     entry_points={
         'console_scripts': [
             'aoc2021 = aoc2021.__main__:main'
@@ -0,0 +1,35 @@
+import math
+from typing import Dict
+
+import pytest
+
+# where pytest's cache keeps how long each test took the last time it was run, in seconds, keyed by node ID
+DURATIONS_KEY = "aoc2021/durations"
+
+# the durations of the tests run (or, under `pytest-xdist`, reported) in this process
+_durations: Dict[str, float] = {}
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    """Runs the tests that took the longest last time first, so `pytest-xdist` workers are not left waiting on one"""
+    cache = getattr(config, "cache", None)
+    durations: Dict[str, float] = {} if cache is None else cache.get(DURATIONS_KEY, {})
+    # tests that have never been timed go first
+    items.sort(key=lambda item: -durations.get(item.nodeid, math.inf))
+
+
+def pytest_runtest_logreport(report):
+    if report.when == "call":
+        _durations[report.nodeid] = report.duration
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    cache = getattr(config, "cache", None)
+    # `pytest-xdist` workers report their tests to the controller, which saves all of the durations at once
+    if cache is None or hasattr(config, "workerinput") or not _durations:
+        return
+    durations: Dict[str, float] = cache.get(DURATIONS_KEY, {})
+    durations.update(_durations)
+    cache.set(DURATIONS_KEY, durations)
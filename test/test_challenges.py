@@ -1,69 +1,161 @@
+from functools import lru_cache, partialmethod
+from hashlib import sha1, sha256
+import io
+import os
 from pathlib import Path
 import subprocess
 import sys
-from time import process_time
-from typing import Optional, Type
+from time import perf_counter_ns
+from typing import Dict, FrozenSet, List, Optional, Tuple, Type
 from unittest import TestCase
 
+from numba import set_num_threads
+
 from aoc2021 import Challenge, DAYS
 
 ROOT_DIR = Path(__file__).absolute().parent.parent
 INPUTS_DIR = ROOT_DIR / "inputs"
 OUTPUTS_DIR = ROOT_DIR / "outputs"
 
+# every part of every challenge, in order; `DAYS` is fully populated on import, so this only has to be sorted once
+CHALLENGE_PARTS: Tuple[Tuple[Type[Challenge], int], ...] = tuple(
+    (challenge_type, part) for _, challenge_type in sorted(DAYS.items()) for part in challenge_type
+)
+
+if "PYTEST_XDIST_WORKER" in os.environ:
+    # `pytest-xdist` already runs a worker per core, so keep Numba's `parallel=True` kernels from oversubscribing them
+    set_num_threads(1)
+
+
+def _git_ls_files(*args: str) -> List[str]:
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", *args, "--", "."], cwd=OUTPUTS_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    return [entry for entry in result.stdout.decode("utf-8").split("\0") if entry]
+
+
+@lru_cache(maxsize=1)
+def clean_tracked_outputs() -> Dict[str, str]:
+    """Returns the `git` blob IDs of the output files that are checked in and unmodified, keyed by file name"""
+    modified = frozenset(_git_ls_files("--modified"))
+    blob_ids: Dict[str, str] = {}
+    for entry in _git_ls_files("--stage"):
+        # each entry is "<mode> <blob ID> <stage>\t<name>"
+        info, name = entry.split("\t", 1)
+        if name not in modified:
+            blob_ids[name] = info.split()[1]
+    return blob_ids
+
+
+def blob_id(data: bytes, length: int = 40) -> str:
+    """Returns the ID `git` would give a blob containing `data`, for object IDs `length` hex digits long"""
+    h = sha1() if length == 40 else sha256()
+    h.update(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+
+def committed_output(output_path: Path) -> str:
+    """Returns the contents of an output file as it is staged in `git`"""
+    return subprocess.run(
+        ["git", "show", f":./{output_path.name}"], cwd=OUTPUTS_DIR, stdout=subprocess.PIPE, check=True
+    ).stdout.decode("utf-8")
+
+
+# list the inputs directory once rather than `stat`ing two candidate paths per test
+AVAILABLE_INPUTS: FrozenSet[str] = frozenset(entry.name for entry in os.scandir(INPUTS_DIR))
+
+
+@lru_cache(maxsize=None)
+def find_input(challenge: Type[Challenge], part: int) -> Optional[Path]:
+    for name in (f"day{challenge.day}part{part}.txt", f"day{challenge.day}.txt"):
+        # if there is no input for this specific part, see if we have a generic input for the entire day
+        if name in AVAILABLE_INPUTS:
+            return INPUTS_DIR / name
+    return None
+
+
+def challenge_test_name(challenge: Type[Challenge], part: int) -> str:
+    return f"test_{challenge.name}_part{part}"
+
+
+def run_challenge(
+        day: int, part: int, input_path: Path, output_path: Path, expected_blob_id: Optional[str] = None
+) -> Tuple[int, int, Optional[str]]:
+    """Runs a part of a challenge, returning its exit code, its wall time in nanoseconds, and its output's blob ID
+
+    The output is collected in memory and written to `output_path` in one go. If it is expected to be the committed blob
+    `expected_blob_id`, it is only written if it differs, so a trusted output is never clobbered and never has to be
+    read.
+
+    """
+    buffer = io.StringIO()
+    start_time = perf_counter_ns()
+    retval = DAYS[day](input_path, buffer).run_part(part)
+    end_time = perf_counter_ns()
+    output = buffer.getvalue().encode("utf-8")
+    if expected_blob_id is None:
+        new_blob_id: Optional[str] = None
+    else:
+        new_blob_id = blob_id(output, len(expected_blob_id))
+    if new_blob_id is None or new_blob_id != expected_blob_id:
+        output_path.write_bytes(output)
+    return retval, end_time - start_time, new_blob_id
+
 
 class TestChallenges(TestCase):
+    clean_outputs: Dict[str, str] = {}
+    durations: List[Tuple[int, int, int]] = []
+
+    @classmethod
+    def setUpClass(cls):
+        # query `git` once for every output rather than twice per test
+        cls.clean_outputs = clean_tracked_outputs()
+        cls.durations = []
+
+    @classmethod
+    def tearDownClass(cls):
+        # report every challenge's time in one write at the end, rather than a line per test
+        if cls.durations:
+            sys.stderr.write("".join(
+                f"Challenge {day} part {part} completed in {elapsed / 1e9:.3f} seconds\n"
+                for day, part, elapsed in sorted(cls.durations)
+            ))
+
     def run_challenge_test(self, challenge: Type[Challenge], part: int):
-        default_input = INPUTS_DIR / f"day{challenge.day}part{part}.txt"
-        if not default_input.exists():
-            # see if we have a generic input for the entire day:
-            default_input = INPUTS_DIR / f"day{challenge.day}.txt"
-            if not default_input.exists():
-                sys.stderr.write(f"Warning: No default input for challenge {challenge.name} part {part}; "
-                                 f"add one at {default_input!s}")
-                return
+        default_input = find_input(challenge, part)
+        if default_input is None:
+            sys.stderr.write(f"Warning: No default input for challenge {challenge.name} part {part}; "
+                             f"add one at {INPUTS_DIR / f'day{challenge.day}.txt'!s}")
+            return
         output_path = OUTPUTS_DIR / f"day{challenge.day}part{part}.txt"
-        expected_output: Optional[bytes] = None
-        # is there an existing output?
-        if output_path.exists():
-            # is the output checked into `git` and unmodified?
-            if subprocess.call(
-                    ["git", "ls-files", "--error-unmatch", output_path.name], cwd=output_path.parent,
-                    stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
-            ) == 0 and subprocess.call(
-                ["git", "diff", "--exit-code", output_path.name], cwd=output_path.parent,
-                stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
-            ) == 0:
-                # the output is checked in and unmodified, so test our result against that output
-                with open(output_path, "rb") as f:
-                    expected_output = f.read()
-        with open(output_path, "w") as f:
-            start_time = process_time()
-            retval = challenge(default_input, f).run_part(part)
-            end_time = process_time()
-            sys.stderr.write(f"Challgenge {challenge.day} part {part} completed in {end_time - start_time} "
-                             "seconds\n")
+        # is there an existing output that is checked into `git` and unmodified?
+        if output_path.exists() and output_path.name in self.clean_outputs:
+            # the output is checked in and unmodified, so test our result against that output's blob ID, which `git`
+            # already knows, so the output itself never has to be read
+            expected_blob_id: Optional[str] = self.clean_outputs[output_path.name]
+        else:
+            expected_blob_id = None
+        retval, elapsed, new_blob_id = run_challenge(challenge.day, part, default_input, output_path, expected_blob_id)
+        self.durations.append((challenge.day, part, elapsed))
         self.assertEqual(retval, 0)
-        if expected_output is not None:
-            # test the output against what was expected:
-            with open(output_path, "rb") as f:
-                new_output = f.read()
-            self.assertEqual(expected_output, new_output)
-
-
-def _challenge_test_wrapper(challenge: Type[Challenge], part: int):
-    def wrapper(self: TestChallenges):
-        return self.run_challenge_test(challenge, part)
-    return wrapper
+        if expected_blob_id is not None and expected_blob_id != new_blob_id:
+            # the output differs from what was expected (and so was written to disk); only now is it worth reading
+            # both versions, to show a diff
+            self.assertEqual(committed_output(output_path), output_path.read_text(),
+                             f"{output_path.name} differs from the committed output")
 
 
 def _add_all_challenges():
     """Adds each challenge as a separate test in `TestChallenges`"""
-    for _, challenge_type in sorted(DAYS.items()):
-        for part in challenge_type:
-            sys.stderr.write(f"Making test_{challenge_type.name}_part{part}\n")
-            setattr(TestChallenges, f"test_{challenge_type.name}_part{part}",
-                    _challenge_test_wrapper(challenge_type, part))
+    # pytest already lists the tests it collects, so they are not printed here
+    for challenge_type, part in CHALLENGE_PARTS:
+        name = challenge_test_name(challenge_type, part)
+        setattr(TestChallenges, name, partialmethod(TestChallenges.run_challenge_test, challenge_type, part))
 
 
 _add_all_challenges()